@@ -4,7 +4,6 @@ import time
 import subprocess
 import json
 import re
-import pyautogui
 from datetime import datetime
 from dotenv import load_dotenv
 from selenium import webdriver
@@ -62,6 +61,8 @@ RESUME_FILE = resolve_path(get_first_resume(RESUMES_DIR))
 print(f"📂 Selected resume: {RESUME_FILE}")
 print(f"📄 Instruction file: {INSTRUCTION_FILE}")
 
+JSON_ARRAY_RE = re.compile(r"(\[.*\])", re.DOTALL)
+
 # ==== Helper: ensure logs dir ====
 LOG_DIR = os.path.join(os.getcwd(), "logs", "reviews")
 os.makedirs(LOG_DIR, exist_ok=True)
@@ -73,16 +74,30 @@ def get_next_result_filename(base_filename: str) -> tuple[str, str, int, str]:
     stem = stem or "result"
     ext = ext.lstrip(".") or "json"
 
-    pattern = re.compile(rf"^(\d+)_({re.escape(stem)})_\d{{8}}_\d{{6}}\.{ext}$", re.IGNORECASE)
-
-    max_index = 0
-    for folder in [os.getcwd(), LOG_DIR]:
-        for f in os.listdir(folder):
-            m = pattern.match(f)
-            if m:
-                max_index = max(max_index, int(m.group(1)))
+    # Last used index is kept in a sidecar file; the directories are only
+    # scanned when it is missing or unreadable.
+    index_file = os.path.join(LOG_DIR, f".{stem}.{ext}.last_index")
+    try:
+        with open(index_file, "r", encoding="utf-8") as f:
+            max_index = int(f.read())
+    except (OSError, ValueError):
+        pattern = re.compile(rf"^(\d+)_({re.escape(stem)})_\d{{8}}_\d{{6}}\.{ext}$", re.IGNORECASE)
+        max_index = 0
+        for folder in [os.getcwd(), LOG_DIR]:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if not entry.name[:1].isdigit():
+                        continue
+                    m = pattern.match(entry.name)
+                    if m:
+                        max_index = max(max_index, int(m.group(1)))
 
     next_index = max_index + 1
+    tmp_file = f"{index_file}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        f.write(str(next_index))
+    os.replace(tmp_file, index_file)
+
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     next_name = f"{next_index}_{stem}_{timestamp}.{ext}"
     return stem, next_name, next_index, ext
@@ -123,9 +138,13 @@ def safe_click(xpath, retries=3, delay=1):
             time.sleep(delay)
     raise last_exception
 
+# Keep Chrome's native file picker from opening; files go straight to the <input> below
+driver.execute_cdp_cmd("Page.setInterceptFileChooserDialog", {"enabled": True})
+
 # Open composer
+ADD_FILES_XPATH = "//div[contains(text(),'Add photos & files')]"
 safe_click("//button[@data-testid='composer-plus-btn']")
-safe_click("//div[contains(text(),'Add photos & files')]")
+safe_click(ADD_FILES_XPATH)
 
 file_input = wait.until(EC.presence_of_element_located((By.XPATH, "//input[@type='file']")))
 driver.execute_script("arguments[0].style.display='block';", file_input)
@@ -134,8 +153,12 @@ all_files_str = "\n".join([resolve_path(f) for f in RESUME_FILES])
 file_input.send_keys(all_files_str)
 
 print(f"📤 Uploaded resumes: {all_files_str}")
-time.sleep(1)
-pyautogui.press("esc")
+# Close the composer menu through the page instead of an OS-level key press
+ActionChains(driver).send_keys(Keys.ESCAPE).perform()
+try:
+    wait.until(EC.invisibility_of_element_located((By.XPATH, ADD_FILES_XPATH)))
+except TimeoutException:
+    pass
 
 # ==== STEP 4: Enter Instructions ====
 textarea = wait.until(EC.presence_of_element_located((By.XPATH, "//div[@id='prompt-textarea']")))
@@ -148,9 +171,29 @@ try:
 except Exception:
     pass
 
-for line in instructions.splitlines():
-    textarea.send_keys(line)
-    textarea.send_keys(Keys.SHIFT, Keys.ENTER)
+# Set the whole prompt in one script call instead of two send_keys round-trips per line.
+# The editor applies DOM edits from its own MutationObserver after the assignment,
+# so whether it kept the text is only checked a moment later. setTimeout rather
+# than requestAnimationFrame, which Chrome pauses in background tabs and minimized windows.
+# The submit button is not checked here: it stays disabled while files upload.
+SET_PROMPT_JS = """
+const [el, text, done] = arguments;
+el.innerText = text;
+el.dispatchEvent(new InputEvent('input', {bubbles: true}));
+const norm = (t) => t.replace(/\\s+/g, ' ').trim();
+setTimeout(() => done(norm(el.innerText) === norm(text)), 100);
+"""
+try:
+    prompt_set = driver.execute_async_script(SET_PROMPT_JS, textarea, instructions)
+except TimeoutException:
+    prompt_set = False
+
+if not prompt_set:
+    # editor rejected programmatic input, clear it and type line by line
+    driver.execute_script("arguments[0].innerText = '';", textarea)
+    for line in instructions.splitlines():
+        textarea.send_keys(line)
+        textarea.send_keys(Keys.SHIFT, Keys.ENTER)
 
 print("📝 Instructions entered.")
 
@@ -162,28 +205,69 @@ print("🚀 Submitted request, waiting for response...")
 # ==== STEP 6: Capture GPT Response ====
 result_text = ""
 MAX_WAIT = 500
-POLL_INTERVAL = 5
-STREAMING_BTN_XPATH = ("//button[@id='composer-submit-button' and @aria-label='Stop streaming']")
-
-elapsed = 0
-while elapsed < MAX_WAIT:
+RESULT_BOX_XPATH = "(//div[@data-message-author-role='assistant'])[last()]"
+
+# Resolves from a MutationObserver once streaming has stopped and the last
+# assistant message has text, instead of polling the DOM. Each call gives up
+# (returning null) after SCRIPT_WAIT seconds: chromedriver's HTTP connection
+# times out at 120s, so one long async call cannot cover MAX_WAIT.
+SCRIPT_WAIT = 30
+WAIT_FOR_RESPONSE_JS = """
+const [waitMs, done] = arguments;
+// an earlier round may have been cut off by the script timeout
+if (window.__responseObserver) {
+    window.__responseObserver.disconnect();
+}
+const finished = () => {
+    // cheap check first: mutations fire for every streamed token
+    if (document.querySelector("button#composer-submit-button[aria-label='Stop streaming']")) {
+        return null;
+    }
+    const boxes = document.querySelectorAll("div[data-message-author-role='assistant']");
+    const text = boxes.length ? boxes[boxes.length - 1].innerText.trim() : "";
+    // "…" alone is the placeholder shown before the answer starts
+    return text && text !== "…" ? text : null;
+};
+const text = finished();
+if (text) {
+    done(text);
+    return;
+}
+const finish = (result) => {
+    observer.disconnect();
+    clearTimeout(timer);
+    done(result);
+};
+const observer = new MutationObserver(() => {
+    const text = finished();
+    if (text) {
+        finish(text);
+    }
+});
+window.__responseObserver = observer;
+observer.observe(document.body, {childList: true, subtree: true, characterData: true, attributes: true});
+const timer = setTimeout(() => finish(null), waitMs);
+"""
+
+# Margin over SCRIPT_WAIT for background tabs, where Chrome throttles setTimeout
+driver.set_script_timeout(SCRIPT_WAIT + 10)
+deadline = time.monotonic() + MAX_WAIT
+while not result_text and time.monotonic() < deadline:
+    wait_ms = int(min(SCRIPT_WAIT, deadline - time.monotonic()) * 1000)
     try:
-        result_box = driver.find_element(By.XPATH, "(//div[@data-message-author-role='assistant'])[last()]")
-        text = result_box.get_attribute("innerText").strip()
-        if text and "…" not in text:
-            result_text = text
+        result_text = driver.execute_async_script(WAIT_FOR_RESPONSE_JS, wait_ms) or ""
+    except TimeoutException:
+        pass  # timer was throttled; the next round replaces the observer
 
-        try:
-            driver.find_element(By.XPATH, STREAMING_BTN_XPATH)
-        except NoSuchElementException:
-            break
+if not result_text:
+    driver.execute_script("if (window.__responseObserver) { window.__responseObserver.disconnect(); }")
+    print("⚠️ Timed out waiting for the response to finish, saving what is there.")
+    try:
+        result_text = driver.find_element(By.XPATH, RESULT_BOX_XPATH).get_attribute("innerText").strip()
     except (StaleElementReferenceException, NoSuchElementException):
         pass
 
-    time.sleep(POLL_INTERVAL)
-    elapsed += POLL_INTERVAL
-
-json_match = re.search(r"(\[.*\])", result_text, re.DOTALL)
+json_match = JSON_ARRAY_RE.search(result_text)
 
 if json_match:
     json_array_text = json_match.group(1)
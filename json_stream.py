@@ -0,0 +1,112 @@
+import re
+import json
+
+JSON_FENCE_RE = re.compile(r"```json\s*")
+# What a number cut at a chunk boundary can still be followed by ("1." -> "1.5e3")
+NUMBER_TAIL_RE = re.compile(r"[0-9.eE+-]*")
+
+
+def invalid(message):
+    return ValueError(f"Invalid JSON in response: {message}")
+
+
+def iter_json_records(chunks):
+    """Yield the records of the ```json array in a streamed response as soon as each one is complete.
+
+    Chunk boundaries may fall anywhere, including inside a record:
+
+    >>> list(iter_json_records(["Sure!\\n```js", "on\\n[{\\"a\\": ", "1}, {\\"b\\"", ": 2}]\\n```"]))
+    [{'a': 1}, {'b': 2}]
+    >>> list(iter_json_records(list('```json\\n["ab", 1.5e3, true, 12345]\\n```')))
+    ['ab', 1500.0, True, 12345]
+    >>> list(iter_json_records(["```json\\n[", "]```"]))
+    []
+    >>> list(iter_json_records(['```json {"a": 1}\\n```']))
+    [{'a': 1}]
+
+    Anything json.loads would reject is rejected too:
+
+    >>> list(iter_json_records(['```json\\n[{"a":1} {"b":2}]```']))
+    Traceback (most recent call last):
+    ValueError: Invalid JSON in response: expected ',' or ']' after an item
+    >>> list(iter_json_records(list("```json\\n[1,,2]```")))
+    Traceback (most recent call last):
+    ValueError: Invalid JSON in response: expected a value after ','
+    >>> list(iter_json_records(["```json\\n[1, 2", "\\n```"]))
+    Traceback (most recent call last):
+    ValueError: Invalid JSON in response: expected ',' or ']' after an item
+    >>> list(iter_json_records(["```json\\n[1, 2"]))
+    Traceback (most recent call last):
+    ValueError: Invalid JSON in response: array is not closed
+    >>> list(iter_json_records(['```json\\n[{"a" 1}]```']))
+    Traceback (most recent call last):
+    ValueError: Invalid JSON in response: Expecting ':' delimiter: line 1 column 6 (char 5)
+    >>> list(iter_json_records(["no json here"]))
+    Traceback (most recent call last):
+    ValueError: No JSON block found in response
+    """
+    decoder = json.JSONDecoder()
+    state = "fence"  # fence -> open -> first | value | sep (array items), or single
+    buf = ""
+    for chunk in chunks:
+        buf += chunk
+        if state == "fence":
+            match = JSON_FENCE_RE.search(buf)
+            if not match:
+                continue
+            buf = buf[match.end():]
+            state = "open"
+        if state == "open":
+            buf = buf.lstrip()
+            if not buf:
+                continue
+            if buf[0] == "[":
+                buf = buf[1:]
+                state = "first"
+            else:
+                state = "single"
+        while state in ("first", "value", "sep"):
+            buf = buf.lstrip()
+            if not buf:
+                break
+            if state == "sep":
+                if buf[0] == "]":
+                    return
+                if buf[0] != ",":
+                    raise invalid("expected ',' or ']' after an item")
+                buf = buf[1:]
+                state = "value"
+                continue
+            if buf[0] == "]" and state == "first":
+                return
+            if buf[0] in ",]":
+                raise invalid("expected a value after ','")
+            try:
+                record, end = decoder.raw_decode(buf)
+            except json.JSONDecodeError:
+                break  # record not complete yet; malformed ones are reported at the end
+            if not isinstance(record, (dict, list)) and NUMBER_TAIL_RE.fullmatch(buf, end):
+                break  # a scalar at the end of the buffer may continue in the next chunk
+            yield record
+            buf = buf[end:]
+            state = "sep"
+
+    if state in ("fence", "open"):
+        raise ValueError("No JSON block found in response")
+    if state != "single":
+        # Leftover that fails before its end is malformed; otherwise the stream was cut short
+        rest = buf.split("```", 1)[0].strip()
+        try:
+            decoder.raw_decode(rest)
+        except json.JSONDecodeError as e:
+            if rest and e.pos < len(rest):
+                raise invalid(e)
+        raise invalid("array is not closed")
+
+    # Stream ended inside a block holding a lone value
+    json_str = buf.split("```", 1)[0].strip()
+    try:
+        value = json.loads(json_str)
+    except json.JSONDecodeError as e:
+        raise invalid(e)
+    yield value
@@ -0,0 +1,8 @@
+import functools
+import spacy
+
+
+@functools.lru_cache(maxsize=None)
+def get_nlp(name="en_core_web_lg", disable=()):
+    """Load a spaCy pipeline once per (name, disable) and reuse it for the rest of the process."""
+    return spacy.load(name, disable=list(disable))
@@ -1,19 +1,40 @@
 import re
 import os
 import json
-import spacy
-import pdfplumber
+import hashlib
+import torch
+import fitz
 import pytesseract
+from PIL import Image
 from sentence_transformers import SentenceTransformer, util
 from itertools import chain
+from collections import OrderedDict
 import dateparser
+from concurrent.futures import ThreadPoolExecutor
+from nlp_loader import get_nlp
+from resume_cache import cached_by_content, content_key, load_cached, save_cached
 
 # ----------------------------
 # Setup
 # ----------------------------
-nlp = spacy.load("en_core_web_lg")
-embedder = SentenceTransformer("all-MiniLM-L6-v2", cache_folder="./models")
+# Only tokenization and NER are used; the rest would run a forward pass per token for nothing
+nlp = get_nlp("en_core_web_lg", disable=("tagger", "parser", "attribute_ruler", "lemmatizer"))
+# nlp.pipe batching; n_process > 1 forks workers that each re-import this module
+SPACY_BATCH_SIZE = int(os.getenv("SPACY_BATCH_SIZE", 32))
+SPACY_N_PROCESS = int(os.getenv("SPACY_N_PROCESS", 1))
+MODELS_DIR = "./models"
+EMBEDDER_MODEL = "all-MiniLM-L6-v2"
+# FP16 on GPU; CPU stays FP32 since half-precision matmuls are slow there
+DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+EMBED_DTYPE = torch.float16 if DEVICE == "cuda" else torch.float32
+embedder = SentenceTransformer(EMBEDDER_MODEL, cache_folder=MODELS_DIR, device=DEVICE)
+if DEVICE == "cuda":
+    embedder.half()
 pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+# Tesseract's own OpenMP threads fight with the OCR thread pool; let the pool
+# own the cores. Read by each tesseract subprocess at spawn time, and set after
+# the torch import so its intra-op threading is left alone.
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
 
 # Load skills DB
 SKILLS_FILE = "./data/skills.json"
@@ -24,35 +45,93 @@ else:
     SKILLS_DB = []
     print(f"Warning: {SKILLS_FILE} not found. SKILLS_DB is empty.")
 
-SKILL_EMBEDDINGS = embedder.encode(SKILLS_DB, convert_to_tensor=True)
+SKILL_MATCH_THRESHOLD = 0.7
+
+def skills_key():
+    """sha256 of the skills file and embedder model: anything cached from skill matching depends on both."""
+    digest = hashlib.sha256()
+    if os.path.exists(SKILLS_FILE):
+        with open(SKILLS_FILE, "rb") as f:
+            digest.update(f.read())
+    digest.update(EMBEDDER_MODEL.encode("utf-8"))
+    return digest.hexdigest()
+
+SKILLS_KEY = skills_key()
+
+def load_skill_embeddings():
+    """Encode SKILLS_DB, reusing the copy saved under MODELS_DIR for the same skills file and model."""
+    if not SKILLS_DB:
+        return embedder.encode(SKILLS_DB, convert_to_tensor=True)
+
+    cache_path = os.path.join(MODELS_DIR, f"skill_emb_{SKILLS_KEY}.pt")
+    if os.path.exists(cache_path):
+        try:
+            return torch.load(cache_path, map_location=DEVICE).to(EMBED_DTYPE)
+        except Exception:
+            pass  # unreadable cache, e.g. a partial write; re-encode and overwrite it
+
+    embeddings = embedder.encode(SKILLS_DB, convert_to_tensor=True)
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    tmp_path = f"{cache_path}.tmp"
+    torch.save(embeddings.float().cpu(), tmp_path)
+    os.replace(tmp_path, cache_path)
+    return embeddings
+
+SKILL_EMBEDDINGS = load_skill_embeddings()
+
+# LRU of n-gram -> embedding, shared across resumes in a run
+NGRAM_CACHE_SIZE = 100_000
+NGRAM_CACHE = OrderedDict()
+
+# ----------------------------
+# Patterns (compiled once, used per resume/line)
+# ----------------------------
+INLINE_WS_RE = re.compile(r"[ \t]+")
+WS_RE = re.compile(r"\s+")
+HEADING_RE = re.compile(r"^(?:[A-Z][A-Z\s/&]+)$", re.MULTILINE)
+EMAIL_RE = re.compile(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}")
+PHONE_RE = re.compile(r"\+?\d[\d\-\s]{9,}\d")
+LINK_RE = re.compile(r"(https?://[^\s|]+|www\.[^\s|]+)")
+DATE_RANGE_RE = re.compile(r"([A-Za-z]{3}\s\d{4}|\d{4}|Present)\s*[-–]\s*([A-Za-z]{3}\s\d{4}|\d{4}|Present)")
+BLANK_LINE_RE = re.compile(r"\n\s*\n")
+DEGREE_RE = re.compile(r"(B\.?Sc|M\.?Sc|B\.?Eng|M\.?Eng|Bachelor|Master|PhD|MBA)[^,\n]*", re.IGNORECASE)
 
 # ----------------------------
 # Helpers
 # ----------------------------
+OCR_CONCURRENCY = os.cpu_count() or 1
+
 def extract_text_from_pdf(path):
-    text = ""
-    with pdfplumber.open(path) as pdf:
-        for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-            else:
-                # fallback to OCR
-                page_image = page.to_image(resolution=300).original
-                text += pytesseract.image_to_string(page_image) + "\n"
-    return text.strip()
+    ocr_images = {}
+    with fitz.open(path) as doc:
+        pages = [page.get_text("text") for page in doc]
+        for i, page_text in enumerate(pages):
+            if not page_text.strip():
+                # no text layer, fallback to OCR (done concurrently below);
+                # born-digital PDFs never get rasterized
+                pix = doc[i].get_pixmap(dpi=300)
+                ocr_images[i] = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+
+    if ocr_images:
+        with ThreadPoolExecutor(max_workers=min(OCR_CONCURRENCY, len(ocr_images))) as pool:
+            ocr_texts = pool.map(pytesseract.image_to_string, ocr_images.values())
+            for i, ocr_text in zip(ocr_images, ocr_texts):
+                pages[i] = ocr_text
+
+    return "\n".join(pages).strip()
 
 def extract_text_from_image(path):
     return pytesseract.image_to_string(path)
 
 def clean_text(text):
-    return re.sub(r"[ \t]+", " ", text).strip()
+    return INLINE_WS_RE.sub(" ", text).strip()
 
 # ----------------------------
 # Section splitter
 # ----------------------------
 def split_sections(text):
-    headings = re.findall(r"^(?:[A-Z][A-Z\s/&]+)$", text, flags=re.MULTILINE)
+    # set, not list: membership is checked for every line of the resume
+    headings = set(HEADING_RE.findall(text))
     sections = {}
     lines = text.split("\n")
     current_heading = None
@@ -72,55 +151,98 @@ def split_sections(text):
 # ----------------------------
 # Extractors
 # ----------------------------
-def extract_name(text, lines_to_check=20):
+def extract_name(text, lines_to_check=20, doc=None):
     lines = text.split("\n")[:lines_to_check]
-    for line in lines:
-        doc = nlp(line)
-        for ent in doc.ents:
-            if ent.label_ == "PERSON":
-                return ent.text
+    header = "\n".join(lines)
+    if doc is None:
+        doc = nlp(header)
+    for ent in doc.ents:
+        if ent.start_char >= len(header):
+            break
+        if ent.label_ == "PERSON":
+            return ent.text
     return lines[0] if lines else None
 
 def extract_contact_info(text):
-    emails = re.findall(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}", text)
-    phones = re.findall(r"\+?\d[\d\-\s]{9,}\d", text)
-    phones = [re.sub(r"\s+", "", p) for p in phones]
+    emails = EMAIL_RE.findall(text)
+    phones = PHONE_RE.findall(text)
+    phones = [WS_RE.sub("", p) for p in phones]
     return {"email": emails, "phone": phones}
 
 def extract_links(text):
-    links = re.findall(r"(https?://[^\s|]+|www\.[^\s|]+)", text)
+    links = LINK_RE.findall(text)
     linkedin = [l for l in links if "linkedin.com" in l.lower()]
     github = [l for l in links if "github.com" in l.lower()]
     others = list(set(links) - set(linkedin) - set(github))
     return {"linkedin": linkedin, "github": github, "other": others}
 
-def extract_skills(text):
-    if not SKILLS_DB or SKILL_EMBEDDINGS is None or SKILL_EMBEDDINGS.numel() == 0:
-        return []
+def encode_ngrams(ngrams):
+    """Embed ngrams, batch-encoding only the ones missing from NGRAM_CACHE."""
+    misses = [g for g in dict.fromkeys(ngrams) if g not in NGRAM_CACHE]
+    if misses:
+        embeddings = embedder.encode(misses, convert_to_tensor=True, batch_size=64)
+        # clone: a row view would keep its whole encode batch alive after eviction
+        NGRAM_CACHE.update((g, e.clone()) for g, e in zip(misses, embeddings))
+
+    for g in ngrams:
+        NGRAM_CACHE.move_to_end(g)
+    stacked = torch.stack([NGRAM_CACHE[g] for g in ngrams])
+    while len(NGRAM_CACHE) > NGRAM_CACHE_SIZE:
+        NGRAM_CACHE.popitem(last=False)
+    return stacked
 
-    doc = nlp(text)
-    tokens = [t.text for t in doc if not t.is_stop and not t.is_punct]
-    ngrams = list(chain.from_iterable(
+def skill_ngrams(doc):
+    tokens = [t.text for t in doc if not t.is_stop and not t.is_punct and not t.is_space]
+    # Resumes repeat the same terms a lot; encode each distinct n-gram once
+    return list(dict.fromkeys(chain.from_iterable(
         [" ".join(tokens[i:i+n]) for i in range(len(tokens)-n+1)]
         for n in range(1, 4)
-    ))
+    )))
 
-    token_embeddings = embedder.encode(ngrams, convert_to_tensor=True, batch_size=32)
-    cosine_scores = util.pytorch_cos_sim(token_embeddings, SKILL_EMBEDDINGS)
+def match_skills(ngram_lists, chunk_size=8192):
+    """Match several resumes' n-grams against SKILLS_DB in one pass.
+
+    The n-grams of all resumes are deduplicated and encoded together, scored
+    against SKILL_EMBEDDINGS as one matrix, and the hits scattered back per resume.
+    """
+    if not SKILLS_DB or SKILL_EMBEDDINGS is None or SKILL_EMBEDDINGS.numel() == 0:
+        return [[] for _ in ngram_lists]
 
-    matched_skills = set()
-    for i, token in enumerate(ngrams):
-        for j, score in enumerate(cosine_scores[i]):
-            if score > 0.7:
-                matched_skills.add(SKILLS_DB[j])
+    unique_ngrams = {}
+    for ngrams in ngram_lists:
+        for g in ngrams:
+            unique_ngrams.setdefault(g, len(unique_ngrams))
+    if not unique_ngrams:
+        return [[] for _ in ngram_lists]
 
-    return sorted(set([s.strip().title() for s in matched_skills]))
+    token_embeddings = encode_ngrams(list(unique_ngrams))
+    # A skill matches if any n-gram clears the threshold; chunked to bound the score matrix
+    hit_matrix = torch.cat([
+        util.pytorch_cos_sim(token_embeddings[i:i + chunk_size], SKILL_EMBEDDINGS) > SKILL_MATCH_THRESHOLD
+        for i in range(0, len(token_embeddings), chunk_size)
+    ])
+
+    results = []
+    for ngrams in ngram_lists:
+        if not ngrams:
+            results.append([])
+            continue
+        hits = hit_matrix[[unique_ngrams[g] for g in ngrams]].any(dim=0)
+        matched_skills = [SKILLS_DB[j] for j in hits.nonzero().flatten().tolist()]
+        results.append(sorted(set([s.strip().title() for s in matched_skills])))
+    return results
+
+def extract_skills(text, doc=None):
+    if doc is None:
+        # stop-word/punctuation flags are lexical, the tokenizer alone is enough
+        doc = nlp.make_doc(text)
+    return match_skills([skill_ngrams(doc)])[0]
 
 # ----------------------------
 # Experience & Education
 # ----------------------------
 def parse_experience_block(block):
-    dates = re.findall(r"([A-Za-z]{3}\s\d{4}|\d{4}|Present)\s*[-–]\s*([A-Za-z]{3}\s\d{4}|\d{4}|Present)", block)
+    dates = DATE_RANGE_RE.findall(block)
     start_date, end_date = (None, None)
     if dates:
         start_date = str(dateparser.parse(dates[0][0]).date().year) if dates[0][0] != "Present" else "Present"
@@ -135,19 +257,21 @@ def parse_experience_block(block):
     description = [l.strip("-*• ").strip() for l in lines[1:] if l.strip()]
     return {"start_date": start_date, "end_date": end_date, "role": role, "company": company, "description": description}
 
-def extract_experience(text):
-    sections = split_sections(text)
+def extract_experience(text, sections=None):
+    if sections is None:
+        sections = split_sections(text)
     exp_text = sections.get("EXPERIENCE", "")
-    blocks = re.split(r"\n\s*\n", exp_text)
+    blocks = BLANK_LINE_RE.split(exp_text)
     experiences = [parse_experience_block(b) for b in blocks if b.strip()]
     return experiences
 
-def extract_education(text):
-    sections = split_sections(text)
+def extract_education(text, sections=None):
+    if sections is None:
+        sections = split_sections(text)
     edu_text = sections.get("EDUCATION", "")
     education = []
     for line in edu_text.split("\n"):
-        degree_match = re.findall(r"(B\.?Sc|M\.?Sc|B\.?Eng|M\.?Eng|Bachelor|Master|PhD|MBA)[^,\n]*", line, re.IGNORECASE)
+        degree_match = DEGREE_RE.findall(line)
         if degree_match:
             education.append({"degree": degree_match[0].strip(), "institution": line.strip()})
     return education
@@ -155,27 +279,60 @@ def extract_education(text):
 # ----------------------------
 # Main Parser
 # ----------------------------
-def parse_resume(path, is_image=False):
+@cached_by_content("ocr")
+def load_resume_text(path, is_image=False):
     text = extract_text_from_image(path) if is_image else extract_text_from_pdf(path)
-    text = "\n".join([l.strip() for l in text.split("\n") if l.strip() != ""])
+    return "\n".join([l.strip() for l in text.split("\n") if l.strip() != ""])
+
+def build_resume(text, doc=None, skills=None):
+    # heading scan over the full text is shared by experience and education
+    sections = split_sections(text)
     return {
-        "name": extract_name(text),
+        "name": extract_name(text, doc=doc),
         "contacts": extract_contact_info(text),
         "links": extract_links(text),
-        "skills": extract_skills(text),
-        "experience": extract_experience(text),
-        "education": extract_education(text),
+        "skills": extract_skills(text, doc=doc) if skills is None else skills,
+        "experience": extract_experience(text, sections=sections),
+        "education": extract_education(text, sections=sections),
         "raw_text": text
     }
 
-def parse_resumes_in_folder(folder_path):
+# Parsed resumes carry skills, so they are only reused for the same skills DB, model and threshold
+PARSED_CACHE_KIND = os.path.join("parsed", f"{SKILLS_KEY}_{SKILL_MATCH_THRESHOLD}")
+
+def parse_resume_files(files):
+    """Parse {name: (path, is_image)}, reusing cached results and batching the rest."""
     parsed_data = {}
+    keys = {}
+    texts = {}
+    for name, (path, is_image) in files.items():
+        key = content_key(path)
+        # None keeps the input order for resumes parsed below
+        parsed_data[name] = load_cached(PARSED_CACHE_KIND, key)
+        if parsed_data[name] is None:
+            keys[name] = key
+            texts[name] = load_resume_text(path, is_image=is_image, cache_key=key)
+
+    # One batched spaCy pass over every resume instead of nlp() per resume/line
+    n_process = min(SPACY_N_PROCESS, max(len(texts), 1))
+    docs = list(nlp.pipe(texts.values(), batch_size=SPACY_BATCH_SIZE, n_process=n_process))
+    # Skills for the whole batch share one encode and one similarity matrix
+    skills = match_skills([skill_ngrams(doc) for doc in docs])
+    for (name, text), doc, resume_skills in zip(texts.items(), docs, skills):
+        parsed_data[name] = build_resume(text, doc=doc, skills=resume_skills)
+        save_cached(PARSED_CACHE_KIND, keys[name], parsed_data[name])
+    return parsed_data
+
+def parse_resume(path, is_image=False):
+    return parse_resume_files({path: (path, is_image)})[path]
+
+def parse_resumes_in_folder(folder_path):
+    files = {}
     for file_name in os.listdir(folder_path):
         ext = file_name.lower().split(".")[-1]
         if ext in ("pdf", "png", "jpg", "jpeg"):
-            path = os.path.join(folder_path, file_name)
-            parsed_data[file_name] = parse_resume(path, is_image=(ext != "pdf"))
-    return parsed_data
+            files[file_name] = (os.path.join(folder_path, file_name), ext != "pdf")
+    return parse_resume_files(files)
 
 # ----------------------------
 # Example usage
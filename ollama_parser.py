@@ -1,15 +1,25 @@
 import ollama
 import pytesseract
-import pdfplumber
-import re
+from PIL import Image
+import fitz
 import os
 import json
+import time
+import queue
+import threading
+import textwrap
 from dotenv import load_dotenv
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from resume_cache import cached_by_content
+from json_stream import iter_json_records
 
 load_dotenv()
 
 pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+# Tesseract's own OpenMP threads fight with the OCR thread pool; let the pool
+# own the cores. Read by each tesseract subprocess at spawn time.
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
 
 PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
 
@@ -24,6 +34,8 @@ RESUMES_DIR = os.getenv("RESUMES_DIR", "resumes")
 RESULT_JSON = os.getenv("OLLAMA_RESPONSE_JSON_PATH", "ollama_response.json")
 INSTRUCTION_FILE = resolve_path(os.getenv("PROMPT_PATH", "prompt.txt"))
 MODEL_NAME = os.getenv("OLLAMA_MODEL_NAME", "deepseek-v3.1:671b-cloud")
+OLLAMA_BATCH_SIZE = int(os.getenv("OLLAMA_BATCH_SIZE", 8))
+OLLAMA_BATCH_WAIT = float(os.getenv("OLLAMA_BATCH_WAIT", 2))
 
 # ==== Pick first resume file ====
 def get_first_resume(resume_dir: str) -> str:
@@ -49,88 +61,133 @@ print(f"📄 Instruction file: {INSTRUCTION_FILE}")
 LOG_DIR = os.path.join(os.getcwd(), "logs", "reviews")
 os.makedirs(LOG_DIR, exist_ok=True)
 
+OCR_CONCURRENCY = os.cpu_count() or 1
+
 def extract_text_from_pdf(path):
-    text = ""
-    with pdfplumber.open(path) as pdf:
-        for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-            else:
-                # fallback to OCR
-                page_image = page.to_image(resolution=300).original
-                text += pytesseract.image_to_string(page_image) + "\n"
-    return text.strip()
+    ocr_images = {}
+    with fitz.open(path) as doc:
+        pages = [page.get_text("text") for page in doc]
+        for i, page_text in enumerate(pages):
+            if not page_text.strip():
+                # no text layer, fallback to OCR (done concurrently below);
+                # born-digital PDFs never get rasterized
+                pix = doc[i].get_pixmap(dpi=300)
+                ocr_images[i] = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+
+    if ocr_images:
+        with ThreadPoolExecutor(max_workers=min(OCR_CONCURRENCY, len(ocr_images))) as pool:
+            ocr_texts = pool.map(pytesseract.image_to_string, ocr_images.values())
+            for i, ocr_text in zip(ocr_images, ocr_texts):
+                pages[i] = ocr_text
+
+    return "\n".join(pages).strip()
 
 def extract_text_from_image(path):
     return pytesseract.image_to_string(path)
 
 
+# Same text as nlp_parser.load_resume_text, so both share the "ocr" cache
+@cached_by_content("ocr")
 def parse_resume(path, is_image=False):
     text = extract_text_from_image(path) if is_image else extract_text_from_pdf(path)
     text = "\n".join([l.strip() for l in text.split("\n") if l.strip() != ""])
     return text
 
-def parse_resumes_in_folder(folder_path):
-    parsed_data = {}
-    for file_name in os.listdir(folder_path):
-        ext = file_name.lower().split(".")[-1]
-        if ext in ("pdf", "png", "jpg", "jpeg"):
-            path = os.path.join(folder_path, file_name)
-            parsed_data[file_name] = parse_resume(path, is_image=(ext != "pdf"))
-    return parsed_data
-
-with open(INSTRUCTION_FILE, "r", encoding="utf-8") as f:
-    instructions = f.read()
-
-
-all_resumes = parse_resumes_in_folder(RESUMES_DIR)
-
-all_resumes_json = json.dumps(all_resumes, indent=4)
-
-
-prompt = f"""--INSTRUCTION--
+def produce_resumes(folder_path, parse_q):
+    """Parse resumes onto parse_q one at a time; ends with None, or with the exception that stopped it."""
+    try:
+        for file_name in os.listdir(folder_path):
+            ext = file_name.lower().split(".")[-1]
+            if ext in ("pdf", "png", "jpg", "jpeg"):
+                path = os.path.join(folder_path, file_name)
+                parse_q.put((file_name, parse_resume(path, is_image=(ext != "pdf"))))
+    except Exception as e:
+        parse_q.put(e)
+    else:
+        parse_q.put(None)
+
+def take_resume(parse_q, timeout=None):
+    item = parse_q.get(timeout=timeout)
+    if isinstance(item, Exception):
+        raise item
+    return item
+
+def next_batch(parse_q):
+    """Wait for one parsed resume, then keep taking until the batch is full or the wait runs out.
+
+    Returns (batch, done) where batch maps file name -> text and done means the producer finished.
+    """
+    first = take_resume(parse_q)
+    if first is None:
+        return {}, True
+
+    batch = dict([first])
+    deadline = time.monotonic() + OLLAMA_BATCH_WAIT
+    while len(batch) < OLLAMA_BATCH_SIZE:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            item = take_resume(parse_q, timeout=remaining)
+        except queue.Empty:
+            break
+        if item is None:
+            return batch, True
+        file_name, text = item
+        batch[file_name] = text
+    return batch, False
+
+def process_batch(resumes):
+    """Send one batch of parsed resumes to Ollama and yield the JSON records it extracts as they stream in."""
+    resumes_json = json.dumps(resumes, indent=4)
+
+    prompt = f"""--INSTRUCTION--
 {instructions}
 --RESUMES--
-{all_resumes_json}"""
+{resumes_json}"""
 
+    messages = [
+      {
+        'role': 'user',
+        'content': prompt,
+      },
+    ]
 
-client = ollama.Client()
+    print(f"Start processing {len(resumes)} resumes ...")
+    stream = client.chat(MODEL_NAME, messages=messages, stream=True)
+    yield from iter_json_records(part['message']['content'] for part in stream)
 
-messages = [
-  {
-    'role': 'user',
-    'content': prompt,
-  },
-]
+    print("✅ Finished collecting response.")
 
-response_text = ""
-
-ollama.pull(MODEL_NAME)
-
-print("Start processing ...")
-# Collect streamed output
-for part in client.chat(MODEL_NAME, messages=messages, stream=True):
-    content = part['message']['content']
-    response_text += content
-
-print("✅ Finished collecting response.")
-
-# Try to capture any json block inside triple backticks
-match = re.search(r"```json\s*([\s\S]*?)```", response_text, re.MULTILINE)
+with open(INSTRUCTION_FILE, "r", encoding="utf-8") as f:
+    instructions = f.read()
 
-if not match:
-    raise ValueError("No JSON block found in response")
 
-json_str = match.group(1).strip()
+# Parse (OCR) resumes on a background thread while the main thread pulls the
+# model and sends finished ones to Ollama in batches, so OCR overlaps with LLM time.
+parse_q = queue.Queue(maxsize=OLLAMA_BATCH_SIZE * 2)
+threading.Thread(target=produce_resumes, args=(RESUMES_DIR, parse_q), daemon=True).start()
 
-# Parse JSON safely
-try:
-    parsed_json = json.loads(json_str)
-except json.JSONDecodeError as e:
-    raise ValueError(f"Invalid JSON in response: {e}")
+client = ollama.Client()
 
-with open(RESULT_JSON, "w", encoding="utf-8") as f:
-    json.dump(parsed_json, f, indent=4, ensure_ascii=False)
+ollama.pull(MODEL_NAME)
 
-print(f"💾 Extracted JSON saved to {RESULT_JSON}")
\ No newline at end of file
+# Records are written out as they are parsed; the partial file only replaces
+# RESULT_JSON once every batch has succeeded.
+partial_json = f"{RESULT_JSON}.part"
+with open(partial_json, "w", encoding="utf-8") as f:
+    f.write("[")
+    count = 0
+    done = False
+    while not done:
+        batch, done = next_batch(parse_q)
+        if not batch:
+            continue
+        for record in process_batch(batch):
+            f.write(",\n" if count else "\n")
+            f.write(textwrap.indent(json.dumps(record, indent=4, ensure_ascii=False), "    "))
+            count += 1
+    f.write("\n]" if count else "]")
+os.replace(partial_json, RESULT_JSON)
+
+print(f"💾 Extracted JSON saved to {RESULT_JSON}")
@@ -0,0 +1,55 @@
+import os
+import json
+import hashlib
+import functools
+
+CACHE_DIR = os.getenv("RESUME_CACHE_DIR", "./cache")
+
+
+def content_key(path):
+    """sha256 of the file's bytes, so renamed or moved resumes still hit the cache."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_cached(kind, key):
+    """Return the value cached under CACHE_DIR/<kind>/<key>.json, or None on a miss."""
+    cache_path = os.path.join(CACHE_DIR, kind, f"{key}.json")
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def save_cached(kind, key, value):
+    cache_dir = os.path.join(CACHE_DIR, kind)
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_path = os.path.join(cache_dir, f"{key}.json")
+    tmp_path = f"{cache_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(value, f, ensure_ascii=False)
+    os.replace(tmp_path, cache_path)
+
+
+def cached_by_content(kind):
+    """Cache func(path, ...) on disk under CACHE_DIR/<kind>, keyed by the content hash of path.
+
+    Each stage gets its own kind (e.g. "ocr", "parsed"), so clearing one stage's
+    directory after changing its code leaves the others intact. Callers that
+    already hashed the file can pass it as cache_key to skip re-reading it.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(path, *args, cache_key=None, **kwargs):
+            key = cache_key or content_key(path)
+            value = load_cached(kind, key)
+            if value is None:
+                value = func(path, *args, **kwargs)
+                save_cached(kind, key, value)
+            return value
+        return wrapper
+    return decorator